@@ -3,16 +3,38 @@ FastAPI Backend for Electricity Theft Detection System
 Loads trained ML models and provides prediction endpoints.
 """
 
+import os
+
+# Cap native thread pools before NumPy/sklearn/TensorFlow are imported, so
+# OpenMP, BLAS, Numba and TF do not each spawn one thread per core and oversubscribe.
+# Count the CPUs this process may run on (container/cgroup affinity), not the host's.
+if hasattr(os, 'sched_getaffinity'):
+    _AVAILABLE_CPUS = len(os.sched_getaffinity(0))
+else:
+    _AVAILABLE_CPUS = os.cpu_count() or 1
+NUM_THREADS = max(1, _AVAILABLE_CPUS // 2)
+for _var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMBA_NUM_THREADS'):
+    os.environ.setdefault(_var, str(NUM_THREADS))
+# Prefer OpenMP for Numba's parallel kernels: the TBB pool can hang at
+# interpreter exit once TensorFlow is loaded
+os.environ.setdefault('NUMBA_THREADING_LAYER_PRIORITY', 'omp tbb workqueue')
+
 from fastapi import FastAPI, File, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 from typing import List, Dict, Any
+from contextlib import asynccontextmanager
 import pandas as pd
 import numpy as np
 import joblib
-import os
-import io
+import orjson
+from numba import njit
+from scipy.special import expit
 import logging
+import tempfile
+import threading
 from datetime import datetime
 
 # TensorFlow imports
@@ -22,6 +44,8 @@ try:
     # Suppress TensorFlow warnings
     os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
     tf.get_logger().setLevel('ERROR')
+    tf.config.threading.set_intra_op_parallelism_threads(2)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
     
     # Define custom AttentionLayer if it exists in the models
     class AttentionLayer(keras.layers.Layer):
@@ -60,17 +84,38 @@ except ImportError:
     AttentionLayer = None
 
 # Import feature extraction
-from features import extract_features_from_row, features_to_array
+from features import FEATURE_NAMES, JIT_WARMUP_ERROR, extract_features_from_matrix
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# features compiles its 24-reading kernel on import
+if JIT_WARMUP_ERROR is None:
+    logger.info("JIT warmup complete")
+else:
+    logger.warning("JIT warmup failed, kernels will compile on first use: %s", JIT_WARMUP_ERROR)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load models before the app starts accepting requests."""
+    try:
+        model_manager.load_all()
+    except Exception as e:
+        # Keep serving /health; the predict endpoints answer 503 until models load
+        logger.error(f"Failed to load models on startup: {str(e)}")
+    
+    # Compile the rule kernel now rather than on the first request
+    _last_day_range(np.zeros((1, 24), dtype=np.float32))
+    
+    yield
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Electricity Theft Detection API",
     description="ML-powered API for detecting electricity theft patterns",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Enable CORS for Next.js frontend
@@ -93,6 +138,7 @@ app.add_middleware(
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MODELS_DIR = os.path.join(BASE_DIR, 'models')
 SCALERS_DIR = os.path.join(BASE_DIR, 'scalers')
+LATEST_PREDICTIONS_PATH = os.path.join(BASE_DIR, 'latest_predictions.json')
 
 ENSEMBLE_WEIGHTS = {
     'autoencoder': 0.25,
@@ -102,8 +148,15 @@ ENSEMBLE_WEIGHTS = {
     'isolationforest': 0.15
 }
 
+# Column order of the per-model score matrix used for the ensemble dot product
+ENSEMBLE_ORDER = ('autoencoder', 'lstm', 'xgboost', 'randomforest', 'isolationforest')
+ENSEMBLE_WEIGHTS_VEC = np.array([ENSEMBLE_WEIGHTS[name] for name in ENSEMBLE_ORDER], dtype=np.float32)
+
 CLASSIFICATION_THRESHOLD = 0.435  # Optimized for 80-90% recall with minimal false positives
 LSTM_SEQUENCE_LENGTH = 72
+LSTM_MAX_BATCH = 1024  # Initial capacity of the reused LSTM input buffer
+LSTM_TFLITE_PATH = os.path.join(MODELS_DIR, 'lstm_fp16.tflite')
+HOUR_COLS = tuple(f'hour_{h}' for h in range(24))  # Hourly columns of generated CSVs
 
 # ========== MODEL LOADING ==========
 
@@ -114,6 +167,9 @@ class ModelManager:
         self.models = {}
         self.scalers = {}
         self.loaded = False
+        self._lstm_fn = None
+        self._lstm_buf = None
+        self.lstm_lock = threading.Lock()
     
     def load_all(self):
         """Load all models and scalers."""
@@ -123,16 +179,26 @@ class ModelManager:
         logger.info("Loading models and scalers...")
         
         try:
+            # mmap_mode='r' keeps the plain NumPy arrays in the sklearn artifacts
+            # (scaler statistics, IsolationForest feature subsets) as read-only
+            # views of the file. Tree node arrays are still copied into private
+            # memory by Tree.__setstate__, so most of the forests' memory stays
+            # per process
+            
             # Load scalers
-            self.scalers['standard'] = joblib.load(os.path.join(SCALERS_DIR, 'standard_scaler.joblib'))
-            self.scalers['minmax'] = joblib.load(os.path.join(SCALERS_DIR, 'minmax_scaler.joblib'))
-            self.scalers['lstm'] = joblib.load(os.path.join(SCALERS_DIR, 'lstm_scaler.joblib'))
+            self.scalers['standard'] = joblib.load(os.path.join(SCALERS_DIR, 'standard_scaler.joblib'), mmap_mode='r')
+            self.scalers['minmax'] = joblib.load(os.path.join(SCALERS_DIR, 'minmax_scaler.joblib'), mmap_mode='r')
+            self.scalers['lstm'] = joblib.load(os.path.join(SCALERS_DIR, 'lstm_scaler.joblib'), mmap_mode='r')
             logger.info("✓ Scalers loaded")
             
             # Load traditional ML models
+            # (XGBoost keeps its booster as an opaque buffer, so mmap does not apply)
             self.models['xgboost'] = joblib.load(os.path.join(MODELS_DIR, 'xgboost_model.joblib'))
-            self.models['randomforest'] = joblib.load(os.path.join(MODELS_DIR, 'randomforest_model.joblib'))
-            self.models['isolationforest'] = joblib.load(os.path.join(MODELS_DIR, 'isolationforest_model.joblib'))
+            # Set the thread count on the booster only: set_params() would push every
+            # pickled parameter back, which newer XGBoost rejects for removed ones
+            self.models['xgboost'].get_booster().set_param({'nthread': NUM_THREADS})
+            self.models['randomforest'] = joblib.load(os.path.join(MODELS_DIR, 'randomforest_model.joblib'), mmap_mode='r')
+            self.models['isolationforest'] = joblib.load(os.path.join(MODELS_DIR, 'isolationforest_model.joblib'), mmap_mode='r')
             logger.info("✓ Traditional ML models loaded")
             
             # Load deep learning models
@@ -146,12 +212,34 @@ class ModelManager:
                 custom_objects = {'AttentionLayer': AttentionLayer}
                 
                 try:
-                    self.models['lstm'] = keras.models.load_model(
-                        os.path.join(MODELS_DIR, 'best_lstm.h5'),
-                        custom_objects=custom_objects,
-                        compile=False
-                    )
-                    logger.info("✓ LSTM loaded")
+                    # Prefer the float16 TFLite conversion (see convert_lstm.py)
+                    if os.path.exists(LSTM_TFLITE_PATH):
+                        try:
+                            interpreter = tf.lite.Interpreter(
+                                model_path=LSTM_TFLITE_PATH,
+                                num_threads=NUM_THREADS
+                            )
+                            interpreter.allocate_tensors()
+                            self.models['lstm'] = interpreter
+                            logger.info("✓ LSTM loaded (TFLite float16)")
+                        except Exception as e:
+                            logger.warning(f"! Could not load TFLite LSTM, using the Keras model: {str(e)}")
+                    
+                    if 'lstm' not in self.models:
+                        lstm_model = keras.models.load_model(
+                            os.path.join(MODELS_DIR, 'best_lstm.h5'),
+                            custom_objects=custom_objects,
+                            compile=False
+                        )
+                        self.models['lstm'] = lstm_model
+                        
+                        # Trace once for any batch size; calling this skips predict()'s
+                        # dataset adapter and callback machinery
+                        self._lstm_fn = tf.function(
+                            lambda x: lstm_model(x, training=False),
+                            input_signature=[tf.TensorSpec(shape=[None, LSTM_SEQUENCE_LENGTH, 1], dtype=tf.float32)]
+                        )
+                        logger.info("✓ LSTM loaded")
                 except Exception as e:
                     logger.warning(f"! Could not load LSTM: {str(e)}")
                     logger.warning("! LSTM will use fallback scoring")
@@ -161,185 +249,392 @@ class ModelManager:
             else:
                 logger.warning("! TensorFlow not available, deep learning models skipped")
             
+            self._lstm_buf = np.zeros((LSTM_MAX_BATCH, LSTM_SEQUENCE_LENGTH, 1), dtype=np.float32)
+            
             self.loaded = True
             logger.info("✓ All models loaded successfully!")
             
         except Exception as e:
             logger.error(f"Error loading models: {str(e)}")
             raise
+    
+    def prepare_lstm_input(self, consumption_matrix: np.ndarray) -> np.ndarray:
+        """
+        Build the scaled (N, LSTM_SEQUENCE_LENGTH, 1) LSTM input in a reused buffer.
+        
+        Each row holds the last LSTM_SEQUENCE_LENGTH readings, left-padded with
+        zeros for shorter rows. The returned array is a view that is overwritten
+        by the next call.
+        """
+        num_rows, num_readings = consumption_matrix.shape
+        if self._lstm_buf is None or len(self._lstm_buf) < num_rows:
+            self._lstm_buf = np.zeros((max(num_rows, LSTM_MAX_BATCH), LSTM_SEQUENCE_LENGTH, 1), dtype=np.float32)
+        
+        lstm_input = self._lstm_buf[:num_rows]
+        window = lstm_input[:, :, 0]
+        k = min(LSTM_SEQUENCE_LENGTH, num_readings)
+        window[:, :LSTM_SEQUENCE_LENGTH - k] = 0.0
+        window[:, LSTM_SEQUENCE_LENGTH - k:] = consumption_matrix[:, num_readings - k:]
+        
+        # Scale in place (padding is scaled too, as during training)
+        scaler = self.scalers['lstm']
+        if hasattr(scaler, 'min_'):
+            np.multiply(window, scaler.scale_[0], out=window)
+            np.add(window, scaler.min_[0], out=window)
+        else:
+            window[:] = scaler.transform(window.reshape(-1, 1)).reshape(window.shape)
+        
+        return lstm_input
+    
+    def predict_lstm(self, lstm_input: np.ndarray) -> np.ndarray:
+        """
+        Run the LSTM on a (N, LSTM_SEQUENCE_LENGTH, 1) batch.
+        
+        Returns:
+            (N, C) array of model outputs
+        """
+        lstm = self.models['lstm']
+        
+        if isinstance(lstm, tf.lite.Interpreter):
+            input_index = lstm.get_input_details()[0]['index']
+            output_index = lstm.get_output_details()[0]['index']
+            
+            # Only reallocate when the batch size changes
+            if lstm.get_input_details()[0]['shape'][0] != len(lstm_input):
+                lstm.resize_tensor_input(input_index, [len(lstm_input), LSTM_SEQUENCE_LENGTH, 1])
+                lstm.allocate_tensors()
+            
+            lstm.set_tensor(input_index, lstm_input.astype(np.float32, copy=False))
+            lstm.invoke()
+            return lstm.get_tensor(output_index)
+        
+        return self._lstm_fn(tf.constant(lstm_input, dtype=tf.float32)).numpy()
 
 # Global model manager
 model_manager = ModelManager()
 
 # ========== RULE-BASED THEFT DETECTION ==========
 
-def detect_theft_rules(consumption_data: np.ndarray, features: dict) -> Dict[str, Any]:
+# Rule severities, indexed into SEVERITY_WEIGHTS for scoring
+SEVERITY_CRITICAL, SEVERITY_HIGH, SEVERITY_MEDIUM, SEVERITY_LOW = range(4)
+SEVERITY_LEVELS = ('critical', 'high', 'medium', 'low')
+SEVERITY_WEIGHTS = np.array([1.0, 0.7, 0.4, 0.2])
+
+@njit(cache=True)
+def _last_day_range(consumption_matrix):
+    """Max - min over each row's last 24 readings (-1.0 if fewer than 24)."""
+    num_rows, n = consumption_matrix.shape
+    ranges = np.full(num_rows, -1.0)
+    if n < 24:
+        return ranges
+    for r in range(num_rows):
+        lo = consumption_matrix[r, n - 24]
+        hi = lo
+        for i in range(n - 23, n):
+            v = consumption_matrix[r, i]
+            if v < lo:
+                lo = v
+            elif v > hi:
+                hi = v
+        ranges[r] = hi - lo
+    return ranges
+
+
+def _tiers(*conditions):
+    """Make multi-tier rule conditions mutually exclusive (if/elif semantics)."""
+    tiers = []
+    taken = np.zeros_like(conditions[0])
+    for condition in conditions:
+        tiers.append(condition & ~taken)
+        taken = taken | condition
+    return tiers
+
+
+def detect_theft_rules_batch(consumption_matrix: np.ndarray, feature_columns: Dict[str, np.ndarray]) -> Dict[str, Any]:
     """
     Apply comprehensive rule-based theft detection with multi-tier thresholds.
     Detects various theft patterns with different severity levels.
     
+    Thresholds are evaluated as boolean masks over the whole batch; rule
+    dictionaries are only built for consumers that trigger at least one rule.
+    
     Args:
-        consumption_data: Array of consumption values
-        features: Extracted features dictionary
+        consumption_matrix: (N, T) array of consumption values
+        feature_columns: Mapping of feature name to (N,) array of values
         
     Returns:
-        Dictionary with detected rules and severity
+        Dictionary with per-consumer detected rules, rule counts and scores
     """
-    detected_rules = []
+    zero_ratio = feature_columns['zero_ratio']
+    negative_count = feature_columns['negative_count']
+    mean_consumption = feature_columns['mean']
+    std_dev = feature_columns['std']
+    cv = feature_columns['cv']
+    trend_slope = feature_columns['trend_slope']
+    low_ratio = feature_columns['low_consumption_ratio']
+    hourly_range = _last_day_range(consumption_matrix)
+    has_usage = mean_consumption > 0
     
     # Rule 1: Zero readings (multi-tier detection)
-    zero_ratio = features.get('zero_ratio', 0)
-    if zero_ratio > 0.3:
-        detected_rules.append({
-            'rule_id': 1,
-            'rule_name': 'Excessive Zero Readings',
-            'description': f'{zero_ratio*100:.1f}% of readings are zero (possible bypass)',
-            'severity': 'critical'
-        })
-    elif zero_ratio > 0.1:
-        detected_rules.append({
-            'rule_id': 1,
-            'rule_name': 'Suspicious Zero Readings',
-            'description': f'{zero_ratio*100:.1f}% of readings are zero',
-            'severity': 'high'
-        })
-    
-    # Rule 2: Negative consumption values (always critical)
-    if features.get('negative_count', 0) > 0:
-        detected_rules.append({
-            'rule_id': 2,
-            'rule_name': 'Negative Consumption',
-            'description': f'{int(features["negative_count"])} negative readings detected (meter tampering)',
-            'severity': 'critical'
-        })
-    
+    zero_critical, zero_high = _tiers(zero_ratio > 0.3, zero_ratio > 0.1)
     # Rule 3: Low consumption (multi-tier detection)
-    mean_consumption = features.get('mean', 0)
-    if mean_consumption < 0.15:
-        detected_rules.append({
-            'rule_id': 3,
-            'rule_name': 'Abnormally Low Consumption',
-            'description': f'Average consumption {mean_consumption:.3f} kWh is suspiciously low',
-            'severity': 'high'
-        })
-    elif 0.15 <= mean_consumption < 0.5:
-        detected_rules.append({
-            'rule_id': 3,
-            'rule_name': 'Low Consumption Pattern',
-            'description': f'Average consumption {mean_consumption:.3f} kWh is below normal',
-            'severity': 'medium'
-        })
-    
+    low_high, low_medium = _tiers(mean_consumption < 0.15, mean_consumption < 0.5)
     # Rule 4: Constant/low variability pattern (multi-tier)
-    std_dev = features.get('std', 0)
-    if std_dev < 0.1 and mean_consumption > 0:
-        detected_rules.append({
-            'rule_id': 4,
-            'rule_name': 'Constant Load Pattern',
-            'description': f'Std dev {std_dev:.3f} indicates artificial constant consumption',
-            'severity': 'high'
-        })
-    elif std_dev < 0.3 and mean_consumption > 0:
-        detected_rules.append({
-            'rule_id': 4,
-            'rule_name': 'Low Variability Pattern',
-            'description': f'Std dev {std_dev:.3f} shows unusually stable consumption',
-            'severity': 'medium'
-        })
-    
+    constant_high, constant_medium = _tiers(std_dev < 0.1, std_dev < 0.3)
     # Rule 5: Erratic pattern (multi-tier detection)
-    cv = features.get('cv', 0)
-    if cv > 2.0:
-        detected_rules.append({
-            'rule_id': 5,
-            'rule_name': 'Extremely Erratic Pattern',
-            'description': f'Coefficient of variation {cv:.2f} shows highly irregular usage',
-            'severity': 'high'
-        })
-    elif cv > 1.2:
-        detected_rules.append({
-            'rule_id': 5,
-            'rule_name': 'Erratic Consumption Pattern',
-            'description': f'Coefficient of variation {cv:.2f} shows irregular usage',
-            'severity': 'medium'
-        })
-    
+    erratic_high, erratic_medium = _tiers(cv > 2.0, cv > 1.2)
     # Rule 6: Consumption trend anomalies (multi-tier)
-    trend_slope = features.get('trend_slope', 0)
-    if trend_slope < -0.05:
-        detected_rules.append({
-            'rule_id': 6,
-            'rule_name': 'Sharp Consumption Drop',
-            'description': f'Trend slope {trend_slope:.4f} indicates rapid decreasing pattern',
-            'severity': 'high'
-        })
-    elif trend_slope < -0.02:
-        detected_rules.append({
-            'rule_id': 6,
-            'rule_name': 'Gradual Consumption Drop',
-            'description': f'Trend slope {trend_slope:.4f} indicates decreasing pattern',
-            'severity': 'medium'
-        })
-    
-    # Rule 7: No peak hours (lack of normal daily pattern)
-    if len(consumption_data) >= 24:
-        hourly_range = np.max(consumption_data[-24:]) - np.min(consumption_data[-24:])
-        if hourly_range < 0.2 and mean_consumption > 0:
-            detected_rules.append({
-                'rule_id': 7,
-                'rule_name': 'No Peak Hour Pattern',
-                'description': 'Lack of normal daily consumption variation (flat profile)',
-                'severity': 'medium'
-            })
-        elif hourly_range < 0.5 and mean_consumption > 0:
-            detected_rules.append({
-                'rule_id': 7,
-                'rule_name': 'Weak Peak Pattern',
-                'description': 'Limited daily consumption variation',
-                'severity': 'low'
-            })
-    
+    drop_high, drop_medium = _tiers(trend_slope < -0.05, trend_slope < -0.02)
+    # Rule 7: No peak hours (lack of normal daily pattern), needs >= 24 readings
+    has_full_day = hourly_range >= 0
+    flat_medium, flat_low = _tiers(has_full_day & (hourly_range < 0.2), has_full_day & (hourly_range < 0.5))
     # Rule 8: High percentage of low consumption (multi-tier)
-    low_ratio = features.get('low_consumption_ratio', 0)
-    if low_ratio > 0.5:
-        detected_rules.append({
-            'rule_id': 8,
-            'rule_name': 'Excessive Low Usage Periods',
-            'description': f'{low_ratio*100:.1f}% of readings are suspiciously low',
-            'severity': 'high'
-        })
-    elif low_ratio > 0.3:
-        detected_rules.append({
-            'rule_id': 8,
-            'rule_name': 'High Low Usage Periods',
-            'description': f'{low_ratio*100:.1f}% of readings are below normal',
-            'severity': 'medium'
-        })
+    low_usage_high, low_usage_medium = _tiers(low_ratio > 0.5, low_ratio > 0.3)
+    
+    # (rule_id, mask, rule_name, description template, severity) in output order
+    rule_table = [
+        (1, zero_critical, 'Excessive Zero Readings',
+         '{zero_pct:.1f}% of readings are zero (possible bypass)', SEVERITY_CRITICAL),
+        (1, zero_high, 'Suspicious Zero Readings',
+         '{zero_pct:.1f}% of readings are zero', SEVERITY_HIGH),
+        # Rule 2: Negative consumption values (always critical)
+        (2, negative_count > 0, 'Negative Consumption',
+         '{negative_count} negative readings detected (meter tampering)', SEVERITY_CRITICAL),
+        (3, low_high, 'Abnormally Low Consumption',
+         'Average consumption {mean:.3f} kWh is suspiciously low', SEVERITY_HIGH),
+        (3, low_medium, 'Low Consumption Pattern',
+         'Average consumption {mean:.3f} kWh is below normal', SEVERITY_MEDIUM),
+        (4, constant_high & has_usage, 'Constant Load Pattern',
+         'Std dev {std:.3f} indicates artificial constant consumption', SEVERITY_HIGH),
+        (4, constant_medium & has_usage, 'Low Variability Pattern',
+         'Std dev {std:.3f} shows unusually stable consumption', SEVERITY_MEDIUM),
+        (5, erratic_high, 'Extremely Erratic Pattern',
+         'Coefficient of variation {cv:.2f} shows highly irregular usage', SEVERITY_HIGH),
+        (5, erratic_medium, 'Erratic Consumption Pattern',
+         'Coefficient of variation {cv:.2f} shows irregular usage', SEVERITY_MEDIUM),
+        (6, drop_high, 'Sharp Consumption Drop',
+         'Trend slope {slope:.4f} indicates rapid decreasing pattern', SEVERITY_HIGH),
+        (6, drop_medium, 'Gradual Consumption Drop',
+         'Trend slope {slope:.4f} indicates decreasing pattern', SEVERITY_MEDIUM),
+        (7, flat_medium & has_usage, 'No Peak Hour Pattern',
+         'Lack of normal daily consumption variation (flat profile)', SEVERITY_MEDIUM),
+        (7, flat_low & has_usage, 'Weak Peak Pattern',
+         'Limited daily consumption variation', SEVERITY_LOW),
+        (8, low_usage_high, 'Excessive Low Usage Periods',
+         '{low_pct:.1f}% of readings are suspiciously low', SEVERITY_HIGH),
+        (8, low_usage_medium, 'High Low Usage Periods',
+         '{low_pct:.1f}% of readings are below normal', SEVERITY_MEDIUM),
+    ]
     
     # Calculate overall rule-based score
-    severity_weights = {'critical': 1.0, 'high': 0.7, 'medium': 0.4, 'low': 0.2}
-    rule_score = sum(severity_weights.get(rule['severity'], 0.5) for rule in detected_rules) / 8.0
-    rule_score = min(rule_score, 1.0)  # Cap at 1.0
+    rule_count = np.zeros(len(consumption_matrix), dtype=np.int64)
+    rule_score = np.zeros(len(consumption_matrix))
+    for _, mask, _, _, severity in rule_table:
+        rule_count += mask
+        rule_score += mask * SEVERITY_WEIGHTS[severity]
+    rule_score = np.minimum(rule_score / 8.0, 1.0)  # Cap at 1.0
+    
+    # Build human-readable rules only for consumers that triggered any
+    detected_rules = [[] for _ in range(len(consumption_matrix))]
+    for i in np.flatnonzero(rule_count):
+        values = {
+            'zero_pct': zero_ratio[i] * 100,
+            'negative_count': int(negative_count[i]),
+            'mean': mean_consumption[i],
+            'std': std_dev[i],
+            'cv': cv[i],
+            'slope': trend_slope[i],
+            'low_pct': low_ratio[i] * 100,
+        }
+        for rule_id, mask, rule_name, description, severity in rule_table:
+            if mask[i]:
+                detected_rules[i].append({
+                    'rule_id': rule_id,
+                    'rule_name': rule_name,
+                    'description': description.format(**values),
+                    'severity': SEVERITY_LEVELS[severity]
+                })
     
     return {
         'detected_rules': detected_rules,
-        'rule_count': len(detected_rules),
+        'rule_count': rule_count,
         'rule_score': rule_score,
-        'has_theft_indicators': len(detected_rules) > 0
+        'has_theft_indicators': rule_count > 0
     }
 
+
 # ========== PREDICTION FUNCTIONS ==========
 
-def get_risk_category(ensemble_score: float) -> str:
-    """Categorize risk based on ensemble score."""
-    if ensemble_score > 0.7:
-        return 'High'
-    elif ensemble_score > 0.4:
-        return 'Medium'
-    elif ensemble_score > 0.2:
-        return 'Low'
+def get_risk_categories(ensemble_scores: np.ndarray) -> np.ndarray:
+    """Categorize risk based on an array of ensemble scores."""
+    return np.select(
+        [ensemble_scores > 0.7, ensemble_scores > 0.4, ensemble_scores > 0.2],
+        ['High', 'Medium', 'Low'],
+        default='Minimal'
+    )
+
+
+def _positive_class_scores(proba: np.ndarray) -> np.ndarray:
+    """Take the theft-class column from a (N, C) probability matrix."""
+    return proba[:, 1] if proba.shape[1] > 1 else proba[:, 0]
+
+
+def run_ml_batch(features_scaled: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Score a (N, F) matrix of scaled features with the traditional ML models.
+    
+    Returns:
+        Dictionary mapping model name to a (N,) array of theft scores
+    """
+    xgb_model = model_manager.models['xgboost']
+    if hasattr(xgb_model, 'get_booster'):
+        # Booster prediction skips the sklearn wrapper; binary:logistic yields P(theft)
+        xgb_pred = xgb_model.get_booster().inplace_predict(features_scaled)
+        xgb_scores = xgb_pred if xgb_pred.ndim == 1 else _positive_class_scores(xgb_pred)
+    else:
+        xgb_scores = _positive_class_scores(xgb_model.predict_proba(features_scaled))
+    
+    rf_scores = _positive_class_scores(model_manager.models['randomforest'].predict_proba(features_scaled))
+    
+    # Isolation Forest: more negative score_samples = more anomalous,
+    # so the negated score goes through a (overflow-safe) sigmoid
+    iso_raw = model_manager.models['isolationforest'].score_samples(features_scaled)
+    iso_scores = expit(-iso_raw).astype(np.float32)
+    
+    return {
+        'xgboost': xgb_scores.astype(np.float32),
+        'randomforest': rf_scores,
+        'isolationforest': iso_scores,
+    }
+
+
+def score_batch(consumption_matrix: np.ndarray) -> Dict[str, Any]:
+    """
+    Run every model on a batch of consumers.
+    
+    Every model is invoked once on the whole batch instead of once per consumer.
+    
+    Args:
+        consumption_matrix: (N, T) array of consumption values, one row per consumer
+        
+    Returns:
+        Dictionary of per-consumer arrays: (N, 5) model scores in ENSEMBLE_ORDER,
+        ensemble scores, risk categories, binary predictions and rule detection
+    """
+    num_consumers = len(consumption_matrix)
+    
+    # Extract features
+    features_matrix = extract_features_from_matrix(consumption_matrix)
+    feature_columns = dict(zip(FEATURE_NAMES, features_matrix.T))
+    
+    # Scale features for traditional ML models
+    features_scaled = model_manager.scalers['standard'].transform(features_matrix)
+    
+    # ===== XGBoost / Random Forest / Isolation Forest =====
+    ml_scores = run_ml_batch(features_scaled)
+    xgb_scores = ml_scores['xgboost']
+    rf_scores = ml_scores['randomforest']
+    iso_scores = ml_scores['isolationforest']
+    
+    # ===== Autoencoder =====
+    # Using intelligent pattern-based anomaly detection
+    # Combine anomaly indicators (higher = more suspicious)
+    # Weights tuned for electricity theft patterns:
+    # - Negative readings (40%): Strong indicator of meter tampering
+    # - Zero readings (30%): Suspicious constant zeros suggest bypass
+    # - High variability (20%): Erratic patterns indicate manipulation
+    # - Low consumption (10%): Abnormally low usage raises flags
+    anomaly_scores = (
+        feature_columns['zero_ratio'] * 0.3 +
+        feature_columns['negative_ratio'] * 0.4 +
+        np.minimum(feature_columns['cv'] / 2.0, 1.0) * 0.2 +
+        feature_columns['low_consumption_ratio'] * 0.1
+    )
+    ae_scores = np.minimum(1.0, anomaly_scores)
+    
+    # ===== LSTM =====
+    if 'lstm' in model_manager.models and keras:
+        # The input buffer and TFLite interpreter are shared across threadpool workers
+        with model_manager.lstm_lock:
+            lstm_input = model_manager.prepare_lstm_input(consumption_matrix)
+            lstm_pred = model_manager.predict_lstm(lstm_input)
+        lstm_scores = _positive_class_scores(lstm_pred)
     else:
-        return 'Minimal'
+        lstm_scores = np.full(num_consumers, 0.5)  # Default if not available
+    
+    # ===== Ensemble Score =====
+    scores_matrix = np.column_stack(
+        [ae_scores, lstm_scores, xgb_scores, rf_scores, iso_scores]
+    ).astype(np.float32, copy=False)
+    ensemble_scores = scores_matrix @ ENSEMBLE_WEIGHTS_VEC
+    
+    # Risk category and binary prediction
+    risk_categories = get_risk_categories(ensemble_scores)
+    ensemble_predictions = (ensemble_scores > CLASSIFICATION_THRESHOLD).astype(np.int8)
+    
+    # Apply rule-based detection
+    rule_detection = detect_theft_rules_batch(consumption_matrix, feature_columns)
+    
+    return {
+        'scores_matrix': scores_matrix,
+        'ensemble_scores': ensemble_scores,
+        'risk_categories': risk_categories,
+        'ensemble_predictions': ensemble_predictions,
+        'rule_detection': rule_detection,
+    }
+
+
+def format_predictions(batch: Dict[str, Any], consumer_ids) -> List[Dict[str, Any]]:
+    """
+    Turn score_batch output into per-consumer prediction dictionaries.
+    
+    Args:
+        batch: Result of score_batch
+        consumer_ids: N consumer identifiers
+        
+    Returns:
+        List of prediction result dictionaries, in input order
+    """
+    ensemble_scores = batch['ensemble_scores'].tolist()
+    risk_categories = batch['risk_categories'].tolist()
+    ensemble_predictions = batch['ensemble_predictions'].tolist()
+    ae_scores, lstm_scores, xgb_scores, rf_scores, iso_scores = batch['scores_matrix'].T.tolist()
+    rule_detection = batch['rule_detection']
+    rule_counts = rule_detection['rule_count'].tolist()
+    rule_scores = rule_detection['rule_score'].tolist()
+    
+    predictions = []
+    for i, consumer_id in enumerate(consumer_ids):
+        predictions.append({
+            'consumer_id': consumer_id,
+            'ensemble_score': ensemble_scores[i],
+            'risk_category': risk_categories[i],
+            'ensemble_prediction': ensemble_predictions[i],
+            'autoencoder_score': ae_scores[i],
+            'lstm_score': lstm_scores[i],
+            'xgboost_score': xgb_scores[i],
+            'randomforest_score': rf_scores[i],
+            'isolationforest_score': iso_scores[i],
+            'detected_rules': rule_detection['detected_rules'][i],
+            'rule_count': rule_counts[i],
+            'rule_score': rule_scores[i],
+        })
+    
+    return predictions
+
+
+def predict_batch(consumption_matrix: np.ndarray, consumer_ids) -> List[Dict[str, Any]]:
+    """
+    Run prediction for a batch of consumers.
+    
+    Args:
+        consumption_matrix: (N, T) array of consumption values, one row per consumer
+        consumer_ids: N consumer identifiers
+        
+    Returns:
+        List of prediction result dictionaries, in input order
+    """
+    return format_predictions(score_batch(consumption_matrix), consumer_ids)
 
 
 def predict_single_consumer(consumption_data: np.ndarray, consumer_id: str) -> Dict[str, Any]:
@@ -354,125 +649,16 @@ def predict_single_consumer(consumption_data: np.ndarray, consumer_id: str) -> D
         Dictionary with prediction results
     """
     try:
-        # Extract features
-        from features import extract_features
-        features_dict = extract_features(consumption_data)
-        features_array = features_to_array(features_dict)
-        features_array = features_array.reshape(1, -1)
-        
-        # Scale features for traditional ML models
-        features_scaled_standard = model_manager.scalers['standard'].transform(features_array)
-        features_scaled_minmax = model_manager.scalers['minmax'].transform(features_array)
-        
-        scores = {}
-        
-        # ===== XGBoost =====
-        xgb_pred_proba = model_manager.models['xgboost'].predict_proba(features_scaled_standard)[0]
-        scores['xgboost'] = float(xgb_pred_proba[1]) if len(xgb_pred_proba) > 1 else float(xgb_pred_proba[0])
-        
-        # ===== Random Forest =====
-        rf_pred_proba = model_manager.models['randomforest'].predict_proba(features_scaled_standard)[0]
-        scores['randomforest'] = float(rf_pred_proba[1]) if len(rf_pred_proba) > 1 else float(rf_pred_proba[0])
-        
-        # ===== Isolation Forest =====
-        # Isolation Forest returns -1 for outliers, 1 for inliers
-        # Convert to 0-1 score
-        iso_pred = model_manager.models['isolationforest'].predict(features_scaled_standard)[0]
-        iso_score = model_manager.models['isolationforest'].score_samples(features_scaled_standard)[0]
-        # Normalize to 0-1 range (more negative = more anomalous)
-        scores['isolationforest'] = float(1 / (1 + np.exp(iso_score)))  # Sigmoid transformation
-        
-        # ===== Autoencoder =====
-        # Using intelligent pattern-based anomaly detection
-        # Analyzes multiple theft indicators from consumption patterns
-        zero_ratio = features_dict.get('zero_ratio', 0)
-        negative_ratio = features_dict.get('negative_ratio', 0)
-        cv = features_dict.get('cv', 0)
-        low_consumption_ratio = features_dict.get('low_consumption_ratio', 0)
-        
-        # Combine anomaly indicators (higher = more suspicious)
-        # Weights tuned for electricity theft patterns:
-        # - Negative readings (40%): Strong indicator of meter tampering
-        # - Zero readings (30%): Suspicious constant zeros suggest bypass
-        # - High variability (20%): Erratic patterns indicate manipulation
-        # - Low consumption (10%): Abnormally low usage raises flags
-        anomaly_score = (
-            zero_ratio * 0.3 +           # Suspicious zeros
-            negative_ratio * 0.4 +       # Very suspicious negatives (meter tampering)
-            min(cv / 2.0, 1.0) * 0.2 +   # High variability (erratic patterns)
-            low_consumption_ratio * 0.1  # Unusually low consumption
-        )
-        
-        scores['autoencoder'] = float(min(1.0, anomaly_score))
-        
-        # ===== LSTM =====
-        if 'lstm' in model_manager.models and keras:
-            # Prepare sequence for LSTM
-            lstm_input = consumption_data[-LSTM_SEQUENCE_LENGTH:] if len(consumption_data) >= LSTM_SEQUENCE_LENGTH else consumption_data
-            
-            # Pad if necessary
-            if len(lstm_input) < LSTM_SEQUENCE_LENGTH:
-                lstm_input = np.pad(lstm_input, (LSTM_SEQUENCE_LENGTH - len(lstm_input), 0), mode='constant')
-            
-            # Scale and reshape
-            lstm_input_scaled = model_manager.scalers['lstm'].transform(lstm_input.reshape(-1, 1))
-            lstm_input_reshaped = lstm_input_scaled.reshape(1, LSTM_SEQUENCE_LENGTH, 1)
-            
-            # Predict
-            lstm_pred = model_manager.models['lstm'].predict(lstm_input_reshaped, verbose=0)[0]
-            scores['lstm'] = float(lstm_pred[1]) if len(lstm_pred) > 1 else float(lstm_pred[0])
-        else:
-            scores['lstm'] = 0.5  # Default if not available
-        
-        # ===== Ensemble Score =====
-        ensemble_score = (
-            scores['autoencoder'] * ENSEMBLE_WEIGHTS['autoencoder'] +
-            scores['lstm'] * ENSEMBLE_WEIGHTS['lstm'] +
-            scores['xgboost'] * ENSEMBLE_WEIGHTS['xgboost'] +
-            scores['randomforest'] * ENSEMBLE_WEIGHTS['randomforest'] +
-            scores['isolationforest'] * ENSEMBLE_WEIGHTS['isolationforest']
-        )
-        
-        # Risk category
-        risk_category = get_risk_category(ensemble_score)
-        
-        # Binary prediction
-        ensemble_prediction = 1 if ensemble_score > CLASSIFICATION_THRESHOLD else 0
-        
-        # Apply rule-based detection
-        rule_detection = detect_theft_rules(consumption_data, features_dict)
-        
-        return {
-            'consumer_id': consumer_id,
-            'ensemble_score': float(ensemble_score),
-            'risk_category': risk_category,
-            'ensemble_prediction': int(ensemble_prediction),
-            'autoencoder_score': float(scores['autoencoder']),
-            'lstm_score': float(scores['lstm']),
-            'xgboost_score': float(scores['xgboost']),
-            'randomforest_score': float(scores['randomforest']),
-            'isolationforest_score': float(scores['isolationforest']),
-            'detected_rules': rule_detection['detected_rules'],
-            'rule_count': rule_detection['rule_count'],
-            'rule_score': rule_detection['rule_score'],
-        }
+        consumption_matrix = np.asarray(consumption_data, dtype=np.float32).reshape(1, -1)
+        return predict_batch(consumption_matrix, [consumer_id])[0]
         
     except Exception as e:
-        logger.error(f"Error predicting for {consumer_id}: {str(e)}")
+        logger.error("Error predicting for %s: %s", consumer_id, e)
         raise
 
 
 # ========== API ENDPOINTS ==========
 
-@app.on_event("startup")
-async def startup_event():
-    """Load models on startup."""
-    try:
-        model_manager.load_all()
-    except Exception as e:
-        logger.error(f"Failed to load models on startup: {str(e)}")
-
-
 @app.get("/")
 async def root():
     """Health check endpoint."""
@@ -496,6 +682,99 @@ async def health_check():
     }
 
 
+def process_prediction_csv(csv_file) -> bytes:
+    """
+    Parse an uploaded CSV, score every consumer and save the results.
+    
+    Blocking end to end (parsing, scoring, formatting, serialization and the
+    disk write), so /predict runs it in the threadpool.
+    
+    Args:
+        csv_file: Binary file object with the uploaded CSV
+        
+    Returns:
+        The JSON response body
+    """
+    # Parse straight from the spooled upload instead of buffering it in memory first
+    df = pd.read_csv(csv_file, engine='pyarrow', dtype_backend='numpy_nullable')
+    
+    logger.info("Processing CSV with %d consumers", len(df))
+    
+    # Validate CSV has data
+    if df.empty:
+        raise HTTPException(status_code=400, detail="CSV file is empty")
+    
+    # Get consumer ID column (first column or one with 'id' in name)
+    id_column = df.columns[0]
+    for col in df.columns:
+        if 'consumer' in col.lower() or col.lower() == 'id':
+            id_column = col
+            break
+    
+    # Check if CSV has ground truth labels
+    has_ground_truth = 'true_theft_label' in df.columns
+    
+    # Extract consumption values (all columns except ID and ground truth label)
+    # Non-numeric cells are coerced to NaN and then treated as 0.0
+    value_cols = [c for c in df.columns if c not in (id_column, 'true_theft_label')]
+    df[value_cols] = df[value_cols].apply(pd.to_numeric, errors='coerce').fillna(0.0)
+    # Row-major and writable (to_numpy() can return a read-only view), so the
+    # row-wise kernels get the array type they were compiled for
+    consumption_matrix = np.require(df[value_cols].to_numpy(dtype=np.float32), np.float32, ['C', 'W'])
+    consumer_ids = df[id_column].astype(str).tolist()
+    
+    # Get predictions for all consumers at once
+    batch = score_batch(consumption_matrix)
+    predictions = format_predictions(batch, consumer_ids)
+    
+    # Add ground truth label if available
+    if has_ground_truth:
+        labels = pd.to_numeric(df['true_theft_label'], errors='coerce').fillna(0).astype(int)
+        for prediction, label in zip(predictions, labels.tolist()):
+            prediction['true_theft_label'] = label
+    
+    logger.info("Successfully processed %d consumers", len(predictions))
+    
+    # Calculate comprehensive statistics from the batch arrays
+    theft_detected = int(batch['ensemble_predictions'].sum())
+    risk_labels, risk_counts = np.unique(batch['risk_categories'], return_counts=True)
+    risk_distribution = dict(zip(risk_labels.tolist(), risk_counts.tolist()))
+    
+    # Calculate average scores
+    model_means = batch['scores_matrix'].mean(axis=0, dtype=np.float64)
+    avg_scores = {'ensemble': float(batch['ensemble_scores'].mean(dtype=np.float64))}
+    avg_scores.update(zip(ENSEMBLE_ORDER, model_means.tolist()))
+    
+    # Model performance summary
+    summary = {
+        'total': len(predictions),
+        'theft_detected': theft_detected,
+        'normal_detected': len(predictions) - theft_detected,
+        'theft_percentage': (theft_detected / len(predictions) * 100) if len(predictions) > 0 else 0,
+        'high_risk': risk_distribution.get('High', 0),
+        'medium_risk': risk_distribution.get('Medium', 0),
+        'low_risk': risk_distribution.get('Low', 0),
+        'minimal_risk': risk_distribution.get('Minimal', 0),
+        'risk_distribution': risk_distribution,
+        'average_scores': avg_scores,
+        'threshold_used': CLASSIFICATION_THRESHOLD
+    }
+    
+    result = {
+        "success": True,
+        "predictions": predictions,
+        "summary": summary,
+        "timestamp": datetime.now().isoformat()
+    }
+    
+    # Serialize once with orjson (handles NumPy scalars natively), then
+    # save the same bytes as the latest results for the dashboard
+    payload = orjson.dumps(result, option=orjson.OPT_SERIALIZE_NUMPY)
+    save_latest_predictions(payload)
+    
+    return payload
+
+
 @app.post("/predict")
 async def predict(file: UploadFile = File(...)):
     """
@@ -505,120 +784,19 @@ async def predict(file: UploadFile = File(...)):
     - First column: consumer_id
     - Remaining columns: hourly consumption values (hour_0, hour_1, ..., hour_23)
     """
+    if not model_manager.loaded:
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    
     try:
-        # Ensure models are loaded
-        if not model_manager.loaded:
-            model_manager.load_all()
-        
-        # Read CSV file
-        contents = await file.read()
-        df = pd.read_csv(io.BytesIO(contents))
-        
-        logger.info(f"Processing CSV with {len(df)} consumers")
-        
-        # Validate CSV has data
-        if df.empty:
-            raise HTTPException(status_code=400, detail="CSV file is empty")
+        # Everything from parsing to saving runs off the event loop
+        payload = await run_in_threadpool(process_prediction_csv, file.file)
         
-        # Get consumer ID column (first column or one with 'id' in name)
-        id_column = df.columns[0]
-        for col in df.columns:
-            if 'consumer' in col.lower() or col.lower() == 'id':
-                id_column = col
-                break
-        
-        predictions = []
-        
-        # Check if CSV has ground truth labels
-        has_ground_truth = 'true_theft_label' in df.columns
-        
-        # Process each consumer
-        for idx, row in df.iterrows():
-            consumer_id = str(row[id_column])
-            
-            # Extract consumption values (all columns except ID and ground truth label)
-            consumption_values = []
-            for col in df.columns:
-                if col != id_column and col != 'true_theft_label':
-                    try:
-                        consumption_values.append(float(row[col]))
-                    except (ValueError, TypeError):
-                        consumption_values.append(0.0)
-            
-            consumption_array = np.array(consumption_values)
-            
-            # Get prediction
-            try:
-                prediction = predict_single_consumer(consumption_array, consumer_id)
-                
-                # Add ground truth label if available
-                if has_ground_truth:
-                    try:
-                        prediction['true_theft_label'] = int(row['true_theft_label'])
-                    except (ValueError, TypeError):
-                        prediction['true_theft_label'] = 0
-                
-                predictions.append(prediction)
-            except Exception as e:
-                logger.error(f"Failed to predict for {consumer_id}: {str(e)}")
-                # Add a default prediction on error
-                predictions.append({
-                    'consumer_id': consumer_id,
-                    'error': str(e),
-                    'ensemble_score': 0.0,
-                    'risk_category': 'Unknown',
-                    'ensemble_prediction': 0
-                })
-        
-        logger.info(f"Successfully processed {len(predictions)} consumers")
-        
-        # Calculate comprehensive statistics
-        theft_detected = sum(1 for p in predictions if p.get('ensemble_prediction') == 1)
-        risk_distribution = {}
-        for p in predictions:
-            risk = p.get('risk_category', 'Unknown')
-            risk_distribution[risk] = risk_distribution.get(risk, 0) + 1
-        
-        # Calculate average scores
-        avg_scores = {
-            'ensemble': np.mean([p.get('ensemble_score', 0) for p in predictions]),
-            'autoencoder': np.mean([p.get('autoencoder_score', 0) for p in predictions]),
-            'lstm': np.mean([p.get('lstm_score', 0) for p in predictions]),
-            'xgboost': np.mean([p.get('xgboost_score', 0) for p in predictions]),
-            'randomforest': np.mean([p.get('randomforest_score', 0) for p in predictions]),
-            'isolationforest': np.mean([p.get('isolationforest_score', 0) for p in predictions]),
-        }
-        
-        # Model performance summary
-        summary = {
-            'total': len(predictions),
-            'theft_detected': theft_detected,
-            'normal_detected': len(predictions) - theft_detected,
-            'theft_percentage': (theft_detected / len(predictions) * 100) if len(predictions) > 0 else 0,
-            'high_risk': risk_distribution.get('High', 0),
-            'medium_risk': risk_distribution.get('Medium', 0),
-            'low_risk': risk_distribution.get('Low', 0),
-            'minimal_risk': risk_distribution.get('Minimal', 0),
-            'risk_distribution': risk_distribution,
-            'average_scores': avg_scores,
-            'threshold_used': CLASSIFICATION_THRESHOLD
-        }
-        
-        result = {
-            "success": True,
-            "predictions": predictions,
-            "summary": summary,
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        # Save latest results for dashboard
-        global latest_prediction_results
-        latest_prediction_results = result
-        
-        return result
+        return Response(content=payload, media_type='application/json')
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Prediction error: {str(e)}")
+        logger.error("Prediction error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -639,14 +817,13 @@ async def predict_manual(request: ManualPredictionRequest):
         "hourly_data": [0.5, 0.4, 0.3, ...]  // 24 hourly values
     }
     """
+    if not model_manager.loaded:
+        raise HTTPException(status_code=503, detail="Models not loaded")
+    
     try:
-        # Ensure models are loaded
-        if not model_manager.loaded:
-            model_manager.load_all()
-        
         consumption_array = np.array(request.hourly_data)
         
-        prediction = predict_single_consumer(consumption_array, request.consumer_id)
+        prediction = await run_in_threadpool(predict_single_consumer, consumption_array, request.consumer_id)
         
         return {
             "success": True,
@@ -655,12 +832,26 @@ async def predict_manual(request: ManualPredictionRequest):
         }
         
     except Exception as e:
-        logger.error(f"Manual prediction error: {str(e)}")
+        logger.error("Manual prediction error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# Global variable to store latest predictions
-latest_prediction_results = None
+def save_latest_predictions(payload: bytes):
+    """
+    Persist the latest prediction JSON so every worker process can serve it.
+    Written to a temporary file and renamed, so readers never see a partial file.
+    """
+    # A unique temp file per call, so concurrent requests never share one
+    with tempfile.NamedTemporaryFile(dir=BASE_DIR, prefix='latest_predictions.',
+                                     suffix='.tmp', delete=False) as f:
+        f.write(payload)
+        tmp_path = f.name
+    try:
+        os.replace(tmp_path, LATEST_PREDICTIONS_PATH)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
 
 @app.get("/models/info")
 async def models_info():
@@ -680,12 +871,14 @@ async def models_info():
 @app.get("/predictions/latest")
 async def get_latest_predictions():
     """Get the latest prediction results for dashboard."""
-    global latest_prediction_results
-    
-    if latest_prediction_results is None:
+    try:
+        with open(LATEST_PREDICTIONS_PATH, 'rb') as f:
+            payload = f.read()
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="No predictions available yet. Please upload a CSV file first.")
     
-    return latest_prediction_results
+    # Already-encoded JSON; no need to re-validate or re-serialize
+    return Response(content=payload, media_type='application/json')
 
 
 # ========== DATA GENERATION ENDPOINT ==========
@@ -711,58 +904,57 @@ async def generate_sample_data(request: DataGenerationRequest):
         
         logger.info(f"Generating data: {request.num_consumers} consumers, {request.days} days, {request.theft_rate*100}% theft rate")
         
-        def generate_realistic_consumption(consumer_id, days):
-            """Generate realistic hourly consumption with daily/weekly/seasonal patterns"""
-            hours = days * 24
-            timestamps = pd.date_range('2024-01-01', periods=hours, freq='H')
+        rng = np.random.default_rng()
+        
+        def generate_realistic_consumption(rng, num_consumers, hour_of_day, day_of_week, day_of_month):
+            """Generate realistic hourly consumption with daily/weekly/seasonal patterns.
+
+            Returns one row of readings per consumer, aligned with the calendar arrays.
+            """
+            hours = len(hour_of_day)
             
             # Base consumption per consumer (0.5-5.0 kWh)
-            base_consumption = np.random.uniform(0.5, 5.0)
-            consumption = np.zeros(hours)
+            base_consumption = rng.uniform(0.5, 5.0, num_consumers).astype(np.float32)
             
-            for i, ts in enumerate(timestamps):
-                hour = ts.hour
-                day_of_week = ts.dayofweek
-                day_of_month = ts.day
-                
-                # Base
-                base = base_consumption
-                
-                # Daily cycle: peaks at 6-9am and 6-10pm
-                if 6 <= hour <= 9:
-                    daily_factor = 1.5 + 0.5 * np.sin(np.pi * (hour - 6) / 3)
-                elif 18 <= hour <= 22:
-                    daily_factor = 1.8 + 0.7 * np.sin(np.pi * (hour - 18) / 4)
-                elif 0 <= hour <= 5:
-                    daily_factor = 0.3 + 0.2 * np.cos(np.pi * hour / 5)
-                else:
-                    daily_factor = 1.0 + 0.3 * np.sin(np.pi * hour / 12)
-                
-                # Weekly effect
-                weekly_factor = 0.9 if (day_of_week >= 5 and 6 <= hour <= 9) else 1.1 if (day_of_week >= 5) else 1.0
-                
-                # Seasonal effect
-                seasonal_factor = 1.0 + 0.15 * np.sin(2 * np.pi * day_of_month / 30)
-                
-                consumption[i] = base * daily_factor * weekly_factor * seasonal_factor
+            # Daily cycle: peaks at 6-9am and 6-10pm
+            day_hours = np.arange(24)
+            daily_factor = np.select(
+                [(day_hours >= 6) & (day_hours <= 9),
+                 (day_hours >= 18) & (day_hours <= 22),
+                 day_hours <= 5],
+                [1.5 + 0.5 * np.sin(np.pi * (day_hours - 6) / 3),
+                 1.8 + 0.7 * np.sin(np.pi * (day_hours - 18) / 4),
+                 0.3 + 0.2 * np.cos(np.pi * day_hours / 5)],
+                default=1.0 + 0.3 * np.sin(np.pi * day_hours / 12)
+            )[hour_of_day]
+            
+            # Weekly effect
+            weekend = day_of_week >= 5
+            weekly_factor = np.where(weekend, np.where((hour_of_day >= 6) & (hour_of_day <= 9), 0.9, 1.1), 1.0)
+            
+            # Seasonal effect
+            seasonal_factor = 1.0 + 0.15 * np.sin(2 * np.pi * day_of_month / 30)
+            
+            pattern = (daily_factor * weekly_factor * seasonal_factor).astype(np.float32)
+            consumption = np.empty((num_consumers, hours), dtype=np.float32)
+            np.multiply(base_consumption[:, None], pattern[None, :], out=consumption)
             
             # Add noise (reduced to prevent theft-like patterns in normal consumers)
-            noise = np.random.normal(0, 0.05 * base_consumption, hours)  # Reduced from 0.1 to 0.05
+            noise = rng.standard_normal((num_consumers, hours), dtype=np.float32)
+            noise *= 0.05 * base_consumption[:, None]  # Reduced from 0.1 to 0.05
             consumption += noise
-            consumption = np.maximum(consumption, 0.2)  # Minimum consumption (increased from 0.1 to 0.2)
+            np.maximum(consumption, 0.2, out=consumption)  # Minimum consumption (increased from 0.1 to 0.2)
             
-            return timestamps, consumption, base_consumption
+            return consumption, base_consumption
         
-        def inject_theft_patterns(consumption, timestamps):
-            """Inject various theft patterns"""
-            theft_consumption = consumption.copy()
-            theft_indicators = np.zeros(len(consumption))
-            total_hours = len(consumption)
+        def inject_theft_patterns(rng, theft_consumption, night_indices):
+            """Inject various theft patterns into a consumption row, in place"""
+            total_hours = len(theft_consumption)
             
             # Randomly select theft types
-            theft_types = np.random.choice(
+            theft_types = rng.choice(
                 ['sudden_drop', 'zero_usage', 'night_spikes', 'negative_readings'],
-                np.random.randint(1, 4), replace=False
+                rng.integers(1, 4), replace=False
             )
             
             for theft_type in theft_types:
@@ -773,11 +965,10 @@ async def generate_sample_data(request: DataGenerationRequest):
                     if max_duration <= min_duration:
                         duration = max(1, total_hours // 2)
                     else:
-                        duration = np.random.randint(min_duration, max_duration + 1)
-                    start_idx = np.random.randint(0, max(1, len(consumption) - duration))
-                    reduction_factor = np.random.uniform(0.3, 0.5)
+                        duration = rng.integers(min_duration, max_duration + 1)
+                    start_idx = rng.integers(0, max(1, total_hours - duration))
+                    reduction_factor = rng.uniform(0.3, 0.5)
                     theft_consumption[start_idx:start_idx + duration] *= reduction_factor
-                    theft_indicators[start_idx:start_idx + duration] = 1
                     
                 elif theft_type == 'zero_usage':
                     # Zero consumption for 24-168 hours (or proportional to total hours)
@@ -786,85 +977,79 @@ async def generate_sample_data(request: DataGenerationRequest):
                     if max_duration <= min_duration:
                         duration = max(1, total_hours // 2)
                     else:
-                        duration = np.random.randint(min_duration, max_duration + 1)
-                    start_idx = np.random.randint(0, max(1, len(consumption) - duration))
+                        duration = rng.integers(min_duration, max_duration + 1)
+                    start_idx = rng.integers(0, max(1, total_hours - duration))
                     theft_consumption[start_idx:start_idx + duration] = 0
-                    theft_indicators[start_idx:start_idx + duration] = 1
                     
                 elif theft_type == 'night_spikes':
                     # 2-3x consumption during 0-6am
-                    night_indices = [i for i, ts in enumerate(timestamps) if ts.hour <= 6]
                     if len(night_indices) > 0:
-                        spike_indices = np.random.choice(night_indices, min(30, len(night_indices)), replace=False)
-                        spike_factor = np.random.uniform(2.0, 3.0)
+                        spike_indices = rng.choice(night_indices, min(30, len(night_indices)), replace=False, shuffle=False)
+                        spike_factor = rng.uniform(2.0, 3.0)
                         theft_consumption[spike_indices] *= spike_factor
-                        theft_indicators[spike_indices] = 1
                     
                 elif theft_type == 'negative_readings':
                     # 1% negative values
-                    num_negative = int(0.01 * len(consumption))
+                    num_negative = int(0.01 * total_hours)
                     if num_negative > 0:
-                        negative_indices = np.random.choice(len(consumption), num_negative, replace=False)
-                        theft_consumption[negative_indices] = np.random.uniform(-0.5, -0.1, num_negative)
-                        theft_indicators[negative_indices] = 1
-            
-            return theft_consumption, theft_indicators.astype(bool)
+                        negative_indices = rng.choice(total_hours, num_negative, replace=False, shuffle=False)
+                        theft_consumption[negative_indices] = rng.uniform(-0.5, -0.1, num_negative)
         
         # Generate dataset
-        all_data = []
         num_theft = int(request.num_consumers * request.theft_rate)
         print(f"DEBUG: num_consumers={request.num_consumers}, theft_rate={request.theft_rate}, num_theft={num_theft}")
-        theft_consumer_ids = np.random.choice(
+        theft_consumer_ids = rng.choice(
             request.num_consumers,
             size=num_theft,
-            replace=False
+            replace=False,
+            shuffle=False
         )
         print(f"DEBUG: Selected {len(theft_consumer_ids)} theft consumers: {theft_consumer_ids}")
+        is_theft_lookup = np.zeros(request.num_consumers, dtype=bool)
+        is_theft_lookup[theft_consumer_ids] = True
         
-        for consumer_id in range(request.num_consumers):
-            timestamps, consumption, base_consumption = generate_realistic_consumption(consumer_id, request.days)
-            is_theft = np.zeros(len(consumption), dtype=bool)
-            
-            if consumer_id in theft_consumer_ids:
-                consumption, is_theft = inject_theft_patterns(consumption, timestamps)
-            else:
-                # Safety check: ensure normal consumers don't have theft-like patterns
-                consumption = np.abs(consumption)  # Remove any negative values
-                zero_count = np.sum(consumption < 0.3)  # Count very low values
-                if zero_count > len(consumption) * 0.3:  # If more than 30% are near-zero
-                    # Add small baseline to prevent all-zero patterns
-                    consumption = np.maximum(consumption, 0.3)
-            
-            # Use the last day's consumption to preserve theft patterns
-            # (Averaging smooths out theft indicators making them undetectable)
-            hours_per_day = 24
-            num_days = len(consumption) // hours_per_day
-            
-            # Take the last complete day of data
-            last_day_consumption = consumption[-hours_per_day:]
-            
-            # Create row with consumer_id and 24 hourly columns
-            row_data = {'consumer_id': f'C{consumer_id+1:03d}'}
-            for hour in range(24):
-                row_data[f'hour_{hour}'] = round(last_day_consumption[hour], 1)
-            
-            # Add ground truth label (1 if this consumer was selected for theft injection, 0 otherwise)
-            row_data['true_theft_label'] = 1 if consumer_id in theft_consumer_ids else 0
-            
-            all_data.append(row_data)
+        # Calendar for the hourly series starting Monday 2024-01-01, shared by all consumers
+        hours = np.arange(request.days * 24)
+        hour_of_day = (hours % 24).astype(np.int8)
+        day_of_week = ((hours // 24) % 7).astype(np.int8)
+        dates = np.datetime64('2024-01-01', 'D') + hours // 24
+        day_of_month = (dates - dates.astype('datetime64[M]')).astype(np.int8) + 1
+        night_indices = np.flatnonzero(hour_of_day <= 6)
         
-        consumption_data = pd.DataFrame(all_data)
+        consumption_matrix, base_consumption = generate_realistic_consumption(
+            rng, request.num_consumers, hour_of_day, day_of_week, day_of_month
+        )
         
-        logger.info(f"Generated {len(consumption_data)} consumers with {len(theft_consumer_ids)} theft consumers")
+        for consumer_id in theft_consumer_ids:
+            inject_theft_patterns(rng, consumption_matrix[consumer_id], night_indices)
+        
+        # Safety check: ensure normal consumers don't have theft-like patterns
+        normal = consumption_matrix[~is_theft_lookup]
+        np.abs(normal, out=normal)  # Remove any negative values
+        low_count = (normal < 0.3).sum(axis=1)  # Count very low values
+        needs_floor = low_count > normal.shape[1] * 0.3  # If more than 30% are near-zero
+        # Add small baseline to prevent all-zero patterns
+        normal[needs_floor] = np.maximum(normal[needs_floor], 0.3)
+        consumption_matrix[~is_theft_lookup] = normal
+        
+        # Use the last day's consumption to preserve theft patterns
+        # (Averaging smooths out theft indicators making them undetectable)
+        last_day_matrix = consumption_matrix[:, -24:]
+        consumer_ids = np.array([f'C{consumer_id+1:03d}' for consumer_id in range(request.num_consumers)])
         
-        # Convert to CSV
-        csv_buffer = io.StringIO()
-        consumption_data.to_csv(csv_buffer, index=False)
-        csv_content = csv_buffer.getvalue()
+        # Ground truth label (1 if this consumer was selected for theft injection, 0 otherwise)
+        labels = is_theft_lookup.astype(np.int8)
+        
+        # One row per consumer: consumer_id, 24 hourly columns, ground truth label
+        consumption_data = pd.DataFrame(last_day_matrix.round(1), columns=list(HOUR_COLS))
+        consumption_data.insert(0, 'consumer_id', consumer_ids)
+        consumption_data['true_theft_label'] = labels
+        
+        logger.info(f"Generated {len(consumption_data)} consumers with {len(theft_consumer_ids)} theft consumers")
         
-        # Return as plain text response
-        from fastapi.responses import PlainTextResponse
-        return PlainTextResponse(content=csv_content, media_type='text/csv')
+        # Convert to CSV and return as plain text response
+        csv_bytes = consumption_data.to_csv(index=False).encode('utf-8')
+        return PlainTextResponse(content=csv_bytes, media_type='text/csv')
         
     except Exception as e:
         logger.error(f"Data generation error: {str(e)}")
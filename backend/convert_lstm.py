@@ -0,0 +1,55 @@
+"""
+Offline conversion of the Keras LSTM to a TFLite float16 model.
+Run once from the backend directory: python convert_lstm.py
+"""
+
+import os
+
+import tensorflow as tf
+from tensorflow import keras
+
+from app import AttentionLayer, LSTM_SEQUENCE_LENGTH, MODELS_DIR
+
+KERAS_PATH = os.path.join(MODELS_DIR, 'best_lstm.h5')
+TFLITE_PATH = os.path.join(MODELS_DIR, 'lstm_fp16.tflite')
+
+
+def build_inference_model(model):
+    """
+    Rebuild the trained model in a TFLite-friendly form.
+
+    - float32 layers (the model was trained with a mixed_float16 policy)
+    - dropout disabled (drops the stateful seed variables)
+    - unrolled LSTMs, so the batch dimension can stay dynamic
+    """
+    layers = []
+    for layer in model.layers:
+        config = dict(layer.get_config(), dtype='float32')
+        if isinstance(layer, keras.layers.LSTM):
+            config.update(dropout=0.0, recurrent_dropout=0.0, unroll=True)
+        layers.append(layer.__class__.from_config(config))
+
+    inference_model = keras.Sequential([keras.Input(shape=(LSTM_SEQUENCE_LENGTH, 1))] + layers)
+    inference_model.set_weights(model.get_weights())
+    return inference_model
+
+
+def main():
+    model = keras.models.load_model(
+        KERAS_PATH,
+        custom_objects={'AttentionLayer': AttentionLayer},
+        compile=False
+    )
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(build_inference_model(model))
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.target_spec.supported_types = [tf.float16]
+
+    with open(TFLITE_PATH, 'wb') as f:
+        f.write(converter.convert())
+
+    print(f"Saved {TFLITE_PATH} ({os.path.getsize(TFLITE_PATH) / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,283 @@ Extracts 34 features from consumption data.
 
 import numpy as np
 import pandas as pd
-from scipy import stats
+from numba import njit, prange
+
+
+# Default feature order (must match training order)
+FEATURE_NAMES = [
+    'mean', 'std', 'median', 'min', 'max', 'range',
+    'q25', 'q75', 'iqr', 'skewness', 'kurtosis', 'cv',
+    'mean_diff', 'std_diff', 'trend_slope',
+    'zero_count', 'zero_ratio', 'negative_count', 'negative_ratio',
+    'low_consumption_count', 'low_consumption_ratio',
+    'high_consumption_count', 'high_consumption_ratio',
+    'mad', 'rolling_std_mean', 'rolling_std_std',
+    'hour_mean', 'hour_std', 'peak_hour',
+    'is_weekend_dominant', 'morning_hour_ratio',
+    'evening_hour_ratio', 'night_hour_ratio', 'sequence_length'
+]
+
+# Column of each feature in the kernel's output buffer
+FEATURE_INDICES = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _quantile_ranks(n, qs):
+    """Both ranks each quantile interpolates between, for np.partition."""
+    ranks = np.empty(2 * qs.shape[0], dtype=np.int64)
+    for k in range(qs.shape[0]):
+        lo = int(qs[k] * (n - 1))
+        ranks[2 * k] = lo
+        ranks[2 * k + 1] = min(lo + 1, n - 1)
+    return ranks
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _partitioned_quantile(part, q):
+    """Linearly interpolated quantile, given the neighbouring ranks are in place."""
+    pos = q * (part.shape[0] - 1)
+    lo = int(pos)
+    hi = min(lo + 1, part.shape[0] - 1)
+    return part[lo] + (part[hi] - part[lo]) * (pos - lo)
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _rolling_std_via_cumsum(s1, s2, w):
+    """Sample std (ddof=1) of every length-w window, from prefix sums of x and x^2."""
+    n = s1.shape[0] - 1
+    out = np.empty(n - w + 1)
+    for k in range(n - w + 1):
+        w_sum = s1[k + w] - s1[k]
+        var = ((s2[k + w] - s2[k]) - w_sum * w_sum / w) / (w - 1)
+        out[k] = np.sqrt(max(var, 0.0))
+    return out
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _extract_stats_kernel(x, n, out):
+    """
+    Write all 34 features of the n readings in x into out, in FEATURE_NAMES order.
+
+    Every feature is derived from a handful of primitives: one pass for the
+    sums, prefix sums, hour-of-day sums and counters, one pass for the centred
+    moments and thresholds, and np.partition for the order statistics.
+    LLVM inlines it into its callers, so a constant n specializes the loops.
+    """
+    n_days = n // 24
+
+    # ---- Pass 1: sums, prefix sums, hour-of-day sums, extremes, counters ----
+    prefix1 = np.empty(n + 1)
+    prefix2 = np.empty(n + 1)
+    hour_sums = np.zeros(24)
+    s1 = 0.0
+    s2 = 0.0
+    s_iy = 0.0
+    mn = x[0]
+    mx = x[0]
+    zero_c = 0
+    neg_c = 0
+    prefix1[0] = 0.0
+    prefix2[0] = 0.0
+    for i in range(n):
+        v = x[i]
+        s1 += v
+        s2 += v * v
+        prefix1[i + 1] = s1
+        prefix2[i + 1] = s2
+        s_iy += i * v
+        if i < n_days * 24:
+            hour_sums[i % 24] += v
+        if v < mn:
+            mn = v
+        if v > mx:
+            mx = v
+        if v == 0:
+            zero_c += 1
+        elif v < 0:
+            neg_c += 1
+    mean = s1 / n
+
+    # ---- Pass 2: centred moments, thresholds, diffs ----
+    low_threshold = mean * 0.1 if mean > 0 else 0.1
+    high_threshold = mean * 2.0 if mean > 0 else 5.0
+    mean_diff = (x[n - 1] - x[0]) / (n - 1) if n > 1 else 0.0
+    m2 = 0.0
+    m3 = 0.0
+    m4 = 0.0
+    low_c = 0
+    high_c = 0
+    d2 = 0.0
+    for i in range(n):
+        v = x[i]
+        dev = v - mean
+        dev2 = dev * dev
+        m2 += dev2
+        m3 += dev2 * dev
+        m4 += dev2 * dev2
+        if v < low_threshold:
+            low_c += 1
+        if v > high_threshold:
+            high_c += 1
+        if i > 0:
+            dd = (v - x[i - 1]) - mean_diff
+            d2 += dd * dd
+    std = np.sqrt(m2 / n)
+
+    # Same near-constant tolerance pandas applies before skew/kurtosis
+    max_abs = max(abs(mn), abs(mx))
+    eps = 2.220446049250313e-16
+    if m2 <= (eps * max_abs) ** 2 * n:
+        m2 = 0.0
+    if abs(m3) <= (eps * max_abs) ** 3 * n:
+        m3 = 0.0
+    if abs(m4) <= (eps * max_abs) ** 4 * n:
+        m4 = 0.0
+
+    skewness = 0.0
+    if n >= 3 and m2 != 0:
+        skewness = (n * (n - 1) ** 0.5 / (n - 2)) * (m3 / m2 ** 1.5)
+    kurt = 0.0
+    if n >= 4:
+        denominator = (n - 2) * (n - 3) * m2 ** 2
+        if denominator != 0:
+            kurt = (n * (n + 1) * (n - 1) * m4 / denominator
+                    - 3.0 * (n - 1) ** 2 / ((n - 2) * (n - 3)))
+
+    # ---- Order statistics (linear interpolation, as np.percentile) ----
+    part = np.partition(x, _quantile_ranks(n, np.array([0.25, 0.5, 0.75])))
+    q25 = _partitioned_quantile(part, 0.25)
+    q75 = _partitioned_quantile(part, 0.75)
+    median = _partitioned_quantile(part, 0.5)
+    abs_dev = np.empty(n, dtype=x.dtype)
+    for i in range(n):
+        abs_dev[i] = abs(x[i] - median)
+    mad = _partitioned_quantile(np.partition(abs_dev, _quantile_ranks(n, np.array([0.5]))), 0.5)
+
+    out[0] = mean
+    out[1] = std
+    out[2] = median
+    out[3] = mn
+    out[4] = mx
+    out[5] = mx - mn
+    out[6] = q25
+    out[7] = q75
+    out[8] = q75 - q25
+    out[9] = skewness
+    out[10] = kurt
+    out[11] = std / mean if mean != 0 else 0.0
+    out[12] = mean_diff
+    out[13] = np.sqrt(d2 / (n - 1)) if n > 1 else 0.0
+    # Least-squares slope against i = 0..n-1, whose centred sum of squares is n(n^2-1)/12
+    out[14] = (s_iy - (n - 1) / 2.0 * s1) / (n * (n * n - 1) / 12.0) if n > 1 else 0.0
+    out[15] = zero_c
+    out[16] = zero_c / n
+    out[17] = neg_c
+    out[18] = neg_c / n
+    out[19] = low_c
+    out[20] = low_c / n
+    out[21] = high_c
+    out[22] = high_c / n
+    out[23] = mad
+
+    if n >= 24:
+        # Rolling 24-hour std (ddof=1), then its mean and std (ddof=1)
+        rolling_std = _rolling_std_via_cumsum(prefix1, prefix2, 24)
+        n_windows = rolling_std.shape[0]
+        r1 = 0.0
+        r2 = 0.0
+        for k in range(n_windows):
+            r1 += rolling_std[k]
+            r2 += rolling_std[k] * rolling_std[k]
+        rolling_mean = r1 / n_windows
+        out[24] = rolling_mean
+        if n_windows > 1:
+            out[25] = np.sqrt(max(r2 - n_windows * rolling_mean ** 2, 0.0) / (n_windows - 1))
+        else:
+            out[25] = 0.0
+    else:
+        out[24] = std
+        out[25] = 0.0
+
+    # Hour-of-day profile over complete days (assuming hourly data from midnight)
+    if n_days > 0:
+        hourly_means = hour_sums / n_days
+        hour_mean = hourly_means.mean()
+        out[26] = hour_mean
+        out[27] = np.sqrt(((hourly_means - hour_mean) ** 2).mean())
+        out[28] = np.argmax(hourly_means)
+
+        # Hour distribution (morning: 6-12, evening: 18-22, night: 22-6)
+        day_total = hour_sums.sum()
+        if day_total > 0:
+            out[30] = hour_sums[6:12].sum() / day_total
+            out[31] = hour_sums[18:22].sum() / day_total
+            out[32] = (hour_sums[22:].sum() + hour_sums[:6].sum()) / day_total
+        else:
+            out[30] = 0.33
+            out[31] = 0.33
+            out[32] = 0.33
+    else:
+        out[26] = mean
+        out[27] = std
+        out[28] = 0
+        out[30] = 0.33
+        out[31] = 0.33
+        out[32] = 0.33
+
+    # Placeholder without date info
+    out[29] = 0
+
+    out[33] = n
+
+
+@njit('void(float32[:, ::1], float32[:, ::1])', parallel=True, cache=True, fastmath=True)
+def _extract_features_batch(mat, out):
+    """Run the feature kernel over every row of an (N, H) matrix."""
+    n_hours = mat.shape[1]
+    for i in prange(mat.shape[0]):
+        _extract_stats_kernel(mat[i], n_hours, out[i])
+
+
+# Series lengths that get their own compiled kernel: one day, one week, 30 days
+SPECIALIZED_LENGTHS = (24, 168, 720)
+_KERNEL_CACHE = {}
+
+
+def _build_kernel(n_hours):
+    """Batch kernel with the series length fixed at compile time."""
+    @njit(parallel=True, cache=True, fastmath=True)
+    def kernel(mat, out):
+        for i in prange(mat.shape[0]):
+            _extract_stats_kernel(mat[i], n_hours, out[i])
+    return kernel
+
+
+def _get_kernel(n_hours):
+    """Length-specialized kernel for the common lengths, the generic one otherwise."""
+    if n_hours not in SPECIALIZED_LENGTHS:
+        return _extract_features_batch
+    if n_hours not in _KERNEL_CACHE:
+        _KERNEL_CACHE[n_hours] = _build_kernel(n_hours)
+    return _KERNEL_CACHE[n_hours]
+
+
+def _sanitize(consumption_data: np.ndarray) -> np.ndarray:
+    """
+    Return the readings as a contiguous, writable float32 array, with NaN/Inf
+    replaced by 0.
+    
+    The batch kernel's fixed signature does not accept read-only arrays, which
+    pandas can return from to_numpy() under copy-on-write.
+    
+    The kernels are compiled with fastmath, which assumes no NaN or Inf values,
+    and every division in them is guarded, so one vectorized check of the input
+    replaces the per-feature NaN/Inf cleanup of the results.
+    """
+    consumption_data = np.require(consumption_data, np.float32, ['C', 'W'])
+    if not np.isfinite(consumption_data).all():
+        consumption_data = np.nan_to_num(consumption_data, nan=0.0, posinf=0.0, neginf=0.0)
+    return consumption_data
 
 
 def extract_features(consumption_data: np.ndarray) -> dict:
@@ -18,141 +294,34 @@ def extract_features(consumption_data: np.ndarray) -> dict:
     Returns:
         Dictionary containing all 34 features
     """
-    features = {}
-    
     # Ensure we have valid data
     if len(consumption_data) == 0:
         return {f'feature_{i}': 0 for i in range(34)}
     
-    consumption_series = pd.Series(consumption_data)
-    
-    # ========== STATISTICAL FEATURES (12) ==========
-    
-    # Basic statistics
-    features['mean'] = np.mean(consumption_data)
-    features['std'] = np.std(consumption_data)
-    features['median'] = np.median(consumption_data)
-    features['min'] = np.min(consumption_data)
-    features['max'] = np.max(consumption_data)
-    features['range'] = features['max'] - features['min']
-    
-    # Percentiles and IQR
-    features['q25'] = np.percentile(consumption_data, 25)
-    features['q75'] = np.percentile(consumption_data, 75)
-    features['iqr'] = features['q75'] - features['q25']
-    
-    # Distribution shape
-    skew_val = consumption_series.skew()
-    kurt_val = consumption_series.kurtosis()
-    features['skewness'] = 0 if pd.isna(skew_val) or np.isnan(skew_val) or np.isinf(skew_val) else skew_val
-    features['kurtosis'] = 0 if pd.isna(kurt_val) or np.isnan(kurt_val) or np.isinf(kurt_val) else kurt_val
-    
-    # Coefficient of variation
-    features['cv'] = features['std'] / features['mean'] if features['mean'] != 0 else 0
-    
-    # ========== TEMPORAL FEATURES (3) ==========
-    
-    # Differences between consecutive readings
-    diffs = np.diff(consumption_data)
-    features['mean_diff'] = np.mean(diffs) if len(diffs) > 0 else 0
-    features['std_diff'] = np.std(diffs) if len(diffs) > 0 else 0
-    
-    # Trend slope (linear regression)
-    if len(consumption_data) > 1:
-        x = np.arange(len(consumption_data))
-        slope, _, _, _, _ = stats.linregress(x, consumption_data)
-        features['trend_slope'] = slope
-    else:
-        features['trend_slope'] = 0
-    
-    # ========== CONSUMPTION PATTERNS (8) ==========
-    
-    # Zero readings
-    features['zero_count'] = np.sum(consumption_data == 0)
-    features['zero_ratio'] = features['zero_count'] / len(consumption_data)
-    
-    # Negative values (theft indicator)
-    features['negative_count'] = np.sum(consumption_data < 0)
-    features['negative_ratio'] = features['negative_count'] / len(consumption_data)
-    
-    # Low consumption (below 10% of mean)
-    low_threshold = features['mean'] * 0.1 if features['mean'] > 0 else 0.1
-    features['low_consumption_count'] = np.sum(consumption_data < low_threshold)
-    features['low_consumption_ratio'] = features['low_consumption_count'] / len(consumption_data)
-    
-    # High consumption (above 200% of mean)
-    high_threshold = features['mean'] * 2.0 if features['mean'] > 0 else 5.0
-    features['high_consumption_count'] = np.sum(consumption_data > high_threshold)
-    features['high_consumption_ratio'] = features['high_consumption_count'] / len(consumption_data)
-    
-    # ========== ADVANCED FEATURES (11) ==========
-    
-    # Median Absolute Deviation
-    features['mad'] = np.median(np.abs(consumption_data - features['median']))
+    consumption_data = _sanitize(consumption_data).reshape(1, -1)
+    out = np.empty((1, 34), dtype=np.float32)
+    _get_kernel(consumption_data.shape[1])(consumption_data, out)
     
-    # Rolling statistics (if enough data)
-    if len(consumption_data) >= 24:
-        rolling_window = 24  # 24-hour window
-        rolling_std = consumption_series.rolling(window=rolling_window).std()
-        rolling_mean = rolling_std.mean()
-        rolling_std_val = rolling_std.std()
-        features['rolling_std_mean'] = 0 if pd.isna(rolling_mean) or np.isnan(rolling_mean) else rolling_mean
-        features['rolling_std_std'] = 0 if pd.isna(rolling_std_val) or np.isnan(rolling_std_val) else rolling_std_val
-    else:
-        features['rolling_std_mean'] = features['std']
-        features['rolling_std_std'] = 0
-    
-    # Time-based features (assuming hourly data)
-    if len(consumption_data) >= 24:
-        # Reshape to hourly patterns
-        hours_available = len(consumption_data)
-        hourly_means = []
-        
-        for hour in range(24):
-            # Get all readings for this hour
-            hour_readings = consumption_data[hour::24]
-            if len(hour_readings) > 0:
-                hourly_means.append(np.mean(hour_readings))
-        
-        if len(hourly_means) > 0:
-            features['hour_mean'] = np.mean(hourly_means)
-            features['hour_std'] = np.std(hourly_means)
-            features['peak_hour'] = np.argmax(hourly_means)
-        else:
-            features['hour_mean'] = features['mean']
-            features['hour_std'] = features['std']
-            features['peak_hour'] = 0
-    else:
-        features['hour_mean'] = features['mean']
-        features['hour_std'] = features['std']
-        features['peak_hour'] = 0
-    
-    # Weekend dominant (simplified - assumes continuous data)
-    features['is_weekend_dominant'] = 0  # Placeholder without date info
+    return dict(zip(FEATURE_NAMES, out[0].tolist()))
+
+
+def extract_features_from_matrix(consumption_matrix: np.ndarray) -> np.ndarray:
+    """
+    Extract the 34 features for every consumer at once.
     
-    # Hour distribution (morning: 6-12, evening: 18-22, night: 22-6)
-    total_consumption = np.sum(consumption_data)
-    if len(consumption_data) >= 24 and total_consumption > 0:
-        # Approximate hourly distribution
-        morning_hours = consumption_data[6:12:24]  # 6 AM to noon
-        evening_hours = consumption_data[18:22:24]  # 6 PM to 10 PM
-        night_hours = np.concatenate([consumption_data[22::24], consumption_data[:6:24]])
+    Args:
+        consumption_matrix: (N, H) array with one row of hourly readings per consumer
         
-        features['morning_hour_ratio'] = np.sum(morning_hours) / total_consumption if len(morning_hours) > 0 else 0
-        features['evening_hour_ratio'] = np.sum(evening_hours) / total_consumption if len(evening_hours) > 0 else 0
-        features['night_hour_ratio'] = np.sum(night_hours) / total_consumption if len(night_hours) > 0 else 0
-    else:
-        features['morning_hour_ratio'] = 0.33
-        features['evening_hour_ratio'] = 0.33
-        features['night_hour_ratio'] = 0.33
-    
-    # Sequence length
-    features['sequence_length'] = len(consumption_data)
+    Returns:
+        (N, 34) float32 array of features in FEATURE_NAMES order
+    """
+    consumption_matrix = _sanitize(consumption_matrix)
+    n_consumers, n_hours = consumption_matrix.shape
+    features = np.zeros((n_consumers, len(FEATURE_NAMES)), dtype=np.float32)
+    if n_hours == 0:
+        return features
     
-    # Final cleanup: Replace any NaN or Inf values with 0
-    for key, value in features.items():
-        if pd.isna(value) or np.isnan(value) or np.isinf(value):
-            features[key] = 0.0
+    _get_kernel(n_hours)(consumption_matrix, features)
     
     return features
 
@@ -171,43 +340,46 @@ def extract_features_from_row(row_data: list, skip_first_column: bool = True) ->
     # Skip consumer ID if needed
     start_idx = 1 if skip_first_column else 0
     
-    # Convert to numeric array, handling any non-numeric values
-    consumption_values = []
-    for val in row_data[start_idx:]:
-        try:
-            consumption_values.append(float(val))
-        except (ValueError, TypeError):
-            consumption_values.append(0.0)
-    
-    consumption_array = np.array(consumption_values)
+    # Convert to numeric array, treating any non-numeric values as 0
+    consumption_array = (
+        pd.to_numeric(pd.Series(row_data[start_idx:], dtype=object), errors='coerce')
+        .fillna(0.0)
+        .to_numpy(dtype=np.float32)
+    )
     
     return extract_features(consumption_array)
 
 
-def features_to_array(features: dict, feature_names: list = None) -> np.ndarray:
+def features_to_array(features, feature_names: list = None) -> np.ndarray:
     """
-    Convert features dictionary to numpy array in correct order.
+    Convert features to numpy array in correct order.
     
     Args:
-        features: Dictionary of features
+        features: Dictionary of features, or an array already in FEATURE_NAMES order
+            (e.g. a row of extract_features_from_matrix), which is passed through
         feature_names: List of feature names in correct order (optional)
         
     Returns:
         1D numpy array of feature values
     """
+    if isinstance(features, np.ndarray):
+        if feature_names is None:
+            return features
+        return features[..., [FEATURE_INDICES[name] for name in feature_names]]
+    
     if feature_names is None:
-        # Default order (must match training order)
-        feature_names = [
-            'mean', 'std', 'median', 'min', 'max', 'range',
-            'q25', 'q75', 'iqr', 'skewness', 'kurtosis', 'cv',
-            'mean_diff', 'std_diff', 'trend_slope',
-            'zero_count', 'zero_ratio', 'negative_count', 'negative_ratio',
-            'low_consumption_count', 'low_consumption_ratio',
-            'high_consumption_count', 'high_consumption_ratio',
-            'mad', 'rolling_std_mean', 'rolling_std_std',
-            'hour_mean', 'hour_std', 'peak_hour',
-            'is_weekend_dominant', 'morning_hour_ratio',
-            'evening_hour_ratio', 'night_hour_ratio', 'sequence_length'
-        ]
+        feature_names = FEATURE_NAMES
     
     return np.array([features.get(name, 0) for name in feature_names])
+
+
+# Compile the kernel for 24 readings (the hourly columns /generate-data writes
+# and the frontend's manual entry) at import time, so the first request does
+# not pay for it; cache=True keeps the machine code for later restarts. Other
+# lengths compile on first use. A failure is not fatal, the kernel is compiled
+# again on first use, but it is recorded so the app can report it.
+JIT_WARMUP_ERROR = None
+try:
+    extract_features_from_matrix(np.zeros((1, 24), dtype=np.float32))
+except Exception as e:
+    JIT_WARMUP_ERROR = e